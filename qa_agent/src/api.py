@@ -1,11 +1,28 @@
 import os
 import shutil
+import asyncio
+from contextlib import asynccontextmanager
+from functools import lru_cache
 from typing import List, Dict, Optional
 from fastapi import FastAPI, UploadFile, File, HTTPException, Form
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from backend import KnowledgeBase, QAAgent
+from backend import KnowledgeBase, QAAgent, warm_up_embedding_model
 
-app = FastAPI(title="QA Agent API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Load the embedding model and create the shared KnowledgeBase once at startup instead of per request.
+    """
+    await run_in_threadpool(warm_up_embedding_model)
+    app.state.kb = KnowledgeBase()
+    yield
+
+app = FastAPI(title="QA Agent API", lifespan=lifespan)
+
+# Copy buffer size when saving uploads that cannot use os.sendfile
+UPLOAD_CHUNK_SIZE = 1 << 20
 
 # --- Pydantic Models ---
 class GenerateTestCasesRequest(BaseModel):
@@ -19,6 +36,66 @@ class GenerateScriptRequest(BaseModel):
     api_key: Optional[str] = None
     model: str = "llama-3.3-70b-versatile"
 
+class GenerateScriptsRequest(BaseModel):
+    test_cases: List[Dict]
+    html_content: str
+    api_key: Optional[str] = None
+    model: str = "llama-3.3-70b-versatile"
+
+# --- Helpers ---
+
+def copy_upload(upload: UploadFile, path: str):
+    """
+    Copy an uploaded file's spooled contents to path.
+    
+    Uploads that Starlette has already spooled to disk are copied in the kernel with os.sendfile
+    where available; in-memory uploads fall back to shutil.copyfileobj with a 1 MB buffer.
+    """
+    src = upload.file
+    src.seek(0)
+    with open(path, "wb") as dst:
+        offset = 0
+        # UploadFile._in_memory is Starlette's own (private) spool check. If a future Starlette drops it,
+        # treat the upload as in memory and use the plain copy; sendfile is only an optimisation.
+        # Calling fileno() on an in-memory spool would force it to disk.
+        if hasattr(os, "sendfile") and not getattr(upload, "_in_memory", True):
+            try:
+                src_fd = src.fileno()
+                size = os.fstat(src_fd).st_size
+                while offset < size:
+                    sent = os.sendfile(dst.fileno(), src_fd, offset, size - offset)
+                    if sent == 0:
+                        break
+                    offset += sent
+                return
+            except OSError:
+                # e.g. platforms where sendfile only targets sockets
+                src.seek(offset)
+                dst.seek(offset)
+        shutil.copyfileobj(src, dst, UPLOAD_CHUNK_SIZE)
+
+async def save_uploads(uploads: List[UploadFile], directory: str) -> List[str]:
+    """
+    Save uploaded files to directory concurrently in worker threads and return their paths.
+    
+    Raises HTTPException (400) if two uploads share a filename, since their concurrent writes would interleave.
+    """
+    paths = [os.path.join(directory, upload.filename) for upload in uploads]
+    duplicates = sorted({upload.filename for upload, path in zip(uploads, paths) if paths.count(path) > 1})
+    if duplicates:
+        raise HTTPException(status_code=400, detail=f"Duplicate upload filenames: {', '.join(duplicates)}")
+    await asyncio.gather(*[
+        run_in_threadpool(copy_upload, upload, path) for upload, path in zip(uploads, paths)
+    ])
+    return paths
+
+@lru_cache(maxsize=16)
+def get_agent(api_key: Optional[str], model: str) -> QAAgent:
+    """
+    Return a cached QAAgent for the given credentials and model, backed by the shared KnowledgeBase.
+    """
+    return QAAgent(api_key=api_key, model=model, kb=app.state.kb)
+
 # --- Endpoints ---
 
 @app.post("/ingest")
@@ -32,30 +109,20 @@ async def ingest_documents(
     try:
         # Ensure temp directory exists
         os.makedirs("temp", exist_ok=True)
-        file_paths = []
-
-        # Save support files
-        for file in files:
-            path = os.path.join("temp", file.filename)
-            with open(path, "wb") as f:
-                shutil.copyfileobj(file.file, f)
-            file_paths.append(path)
 
-        # Save HTML file
-        html_path = os.path.join("temp", html_file.filename)
-        with open(html_path, "wb") as f:
-            shutil.copyfileobj(html_file.file, f)
-        file_paths.append(html_path)
+        # Save support files and the HTML file
+        file_paths = await save_uploads([*files, html_file], "temp")
 
         # Ingest
-        kb = KnowledgeBase()
-        num_chunks = kb.ingest_documents(file_paths)
+        num_chunks = await run_in_threadpool(app.state.kb.ingest_documents, file_paths)
         
         return {
             "message": "Ingestion successful", 
             "chunks": num_chunks, 
             "files": len(file_paths)
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
@@ -68,8 +135,8 @@ async def generate_test_cases(request: GenerateTestCasesRequest):
     Generate test cases based on requirements.
     """
     try:
-        agent = QAAgent(api_key=request.api_key, model=request.model)
-        test_cases = agent.generate_test_cases(request.requirement)
+        agent = get_agent(request.api_key, request.model)
+        test_cases = await agent.generate_test_cases(request.requirement)
         return test_cases
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -80,12 +147,51 @@ async def generate_script(request: GenerateScriptRequest):
     Generate a Selenium script for a specific test case.
     """
     try:
-        agent = QAAgent(api_key=request.api_key, model=request.model)
-        script = agent.generate_selenium_script(request.test_case, request.html_content)
+        agent = get_agent(request.api_key, request.model)
+        script = await agent.generate_selenium_script(request.test_case, request.html_content)
         return {"script": script}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/generate-script/stream")
+async def generate_script_stream(request: GenerateScriptRequest):
+    """
+    Stream a Selenium script for a specific test case as plain text while it is generated.
+    """
+    try:
+        agent = get_agent(request.api_key, request.model)
+        stream = agent.astream_selenium_script(request.test_case, request.html_content)
+        # Wait for the first chunk so failures before any output become a proper error response
+        try:
+            first_chunk = await stream.__anext__()
+        except StopAsyncIteration:
+            first_chunk = ""
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    async def body():
+        yield first_chunk
+        try:
+            async for chunk in stream:
+                yield chunk
+        except Exception as e:
+            # The 200 status is already sent; end the text with a marker the client checks for
+            yield f"\n# Error generating script: {str(e)}"
+
+    return StreamingResponse(body(), media_type="text/plain")
+
+@app.post("/generate-scripts")
+async def generate_scripts(request: GenerateScriptsRequest):
+    """
+    Generate Selenium scripts for several test cases in batched LLM calls.
+    """
+    try:
+        agent = get_agent(request.api_key, request.model)
+        scripts = await agent.generate_selenium_scripts(request.test_cases, request.html_content)
+        return {"scripts": scripts}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
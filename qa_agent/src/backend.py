@@ -1,11 +1,21 @@
 import os
 import json
 import shutil
-import time
-from typing import List, Dict, Any
+import hashlib
+import sqlite3
+import itertools
+import functools
+import asyncio
+import copy
+import re
+import html
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, AsyncIterator
+import numpy as np
 import chromadb
-from chromadb.utils import embedding_functions
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from chromadb import Documents, EmbeddingFunction, Embeddings
 from langchain_community.document_loaders import (
     UnstructuredMarkdownLoader, 
     TextLoader, 
@@ -14,11 +24,319 @@ from langchain_core.documents import Document
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser, JsonOutputParser
 from langchain_groq import ChatGroq
-from bs4 import BeautifulSoup
+from lxml import etree
+from lxml import html as lxml_html
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Chunk counts below this are added to ChromaDB in a single call.
+SINGLE_ADD_LIMIT = 5000
+# Batch size for larger ingests (ChromaDB recommends 100-250 per add call).
+ADD_BATCH_SIZE = 200
+
+# Chunking parameters for ingested documents, in characters
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+SPLIT_SEPARATORS = [re.compile(r"\n\n"), re.compile(r"\n"), re.compile(r" ")]
+
+# Upper bound on results returned by a single knowledge base query
+MAX_QUERY_RESULTS = 50
+
+EMBED_MODEL_NAME = "all-MiniLM-L6-v2"
+EMBED_DEVICE = os.getenv("EMBED_DEVICE", "cpu")
+# Sequences per SentenceTransformer forward pass (Chroma's wrapper uses the default of 32).
+EMBED_BATCH_SIZE = 128
+
+
+@functools.lru_cache(maxsize=None)
+def get_embedding_model(model_name: str = EMBED_MODEL_NAME, device: str = EMBED_DEVICE):
+    """
+    Load a SentenceTransformer model once per process and reuse it.
+    
+    Args:
+        model_name (str): SentenceTransformer model to load.
+        device (str): Device to run the model on.
+        
+    Returns:
+        SentenceTransformer: The shared model instance.
+    """
+    from sentence_transformers import SentenceTransformer
+    
+    return SentenceTransformer(model_name, device=device)
+
+
+def warm_up_embedding_model():
+    """
+    Load the shared embedding model and run one encode so the first request doesn't pay the startup cost.
+    """
+    get_embedding_model().encode(["warm up"], show_progress_bar=False)
+
+
+class LocalEmbeddingFunction(EmbeddingFunction):
+    """
+    ChromaDB embedding function backed by a local SentenceTransformer model.
+    """
+    def __init__(self, model_name: str = EMBED_MODEL_NAME, device: str = EMBED_DEVICE, batch_size: int = EMBED_BATCH_SIZE):
+        """
+        Initialize the embedding function.
+        
+        Args:
+            model_name (str): SentenceTransformer model to load.
+            device (str): Device to run the model on (e.g. "cpu", "cuda", "mps").
+            batch_size (int): Number of sequences encoded per forward pass.
+        """
+        self.model = get_embedding_model(model_name, device)
+        self.batch_size = batch_size
+
+    def __call__(self, input: Documents) -> Embeddings:
+        """
+        Embed the given documents.
+        
+        Args:
+            input (Documents): Texts to embed.
+            
+        Returns:
+            Embeddings: One normalized vector per input text.
+        """
+        vectors = self.model.encode(
+            list(input),
+            batch_size=self.batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False
+        )
+        return vectors.tolist()
+
+
+HTML_PARSER = lxml_html.HTMLParser(encoding="utf-8")
+
+
+def load_document(path: str) -> List[Document]:
+    """
+    Load a single file into LangChain documents based on its extension.
+    
+    Args:
+        path (str): Path to the file to load.
+        
+    Returns:
+        List[Document]: Loaded documents (empty if the file could not be loaded).
+    """
+    try:
+        ext = os.path.splitext(path)[1].lower()
+        if ext == ".md":
+            loader = UnstructuredMarkdownLoader(path)
+            return loader.load()
+        elif ext == ".txt":
+            loader = TextLoader(path)
+            return loader.load()
+        elif ext == ".json":
+            # Embed the raw JSON text; re-parsing and pretty-printing it adds nothing for retrieval
+            with open(path, 'r', encoding='utf-8') as f:
+                text = f.read()
+            return [Document(page_content=text, metadata={"source": path})]
+        elif ext == ".html":
+            # Load HTML content with lxml; scripts and styles are dropped so only visible text is indexed.
+            # Decode as UTF-8 explicitly, since libxml2 assumes Latin-1 without a <meta charset>.
+            with open(path, 'rb') as f:
+                tree = lxml_html.fromstring(f.read(), parser=HTML_PARSER)
+            for element in tree.xpath("//script|//style"):
+                element.drop_tree()
+            # Separate text nodes so adjacent elements don't run together
+            text = "\n".join(tree.itertext())
+            return [Document(page_content=text, metadata={"source": path})]
+    except Exception as e:
+        print(f"Error loading {path}: {e}")
+    return []
+
+
+def split_text(text: str, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP) -> List[str]:
+    """
+    Split text into chunks of at most chunk_size characters with roughly chunk_overlap characters of overlap.
+    
+    Chunks end on a paragraph break where possible, then a line break, then a space,
+    and only cut mid-word when a single word is longer than chunk_size.
+    
+    Args:
+        text (str): The text to split.
+        chunk_size (int): Maximum number of characters per chunk.
+        chunk_overlap (int): Number of characters shared by consecutive chunks.
+        
+    Returns:
+        List[str]: The non-empty chunks, in order.
+    
+    Example:
+        A long unbroken token after a short prefix is cut without repeating the prefix:
+        
+        >>> [len(c) for c in split_text("Logo data uri: " + "QUJD" * 1000)]
+        [14, 1000, 1000, 1000, 1000, 800]
+    """
+    n = len(text)
+    # Boundary offsets (just after each separator) per separator, in order of preference
+    boundaries = [
+        np.fromiter((m.end() for m in sep.finditer(text)), dtype=np.int64)
+        for sep in SPLIT_SEPARATORS
+    ]
+    all_boundaries = np.unique(np.concatenate(boundaries))
+    
+    chunks = []
+    start = 0
+    while start < n:
+        limit = start + chunk_size
+        if limit >= n:
+            end = n
+        else:
+            end = limit
+            # Take the last preferred boundary in the second half of the window,
+            # falling back to any space after start before cutting mid-word.
+            for i, bounds in enumerate(boundaries):
+                floor = start if i == len(boundaries) - 1 else start + chunk_size // 2
+                idx = np.searchsorted(bounds, limit, side="right") - 1
+                if idx >= 0 and bounds[idx] > floor:
+                    end = int(bounds[idx])
+                    break
+        
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        if end >= n:
+            break
+        
+        # Start the next chunk on a boundary within the overlap window. Only overlap if the window
+        # lies entirely after start; otherwise a short chunk ending in the space fallback would
+        # restart at (almost) the same place and emit near-duplicates.
+        next_start = end - chunk_overlap
+        if next_start <= start:
+            start = end
+            continue
+        idx = np.searchsorted(all_boundaries, next_start, side="left")
+        if idx < len(all_boundaries) and all_boundaries[idx] < end:
+            next_start = int(all_boundaries[idx])
+        start = next_start if start < next_start < end else end
+    return chunks
+
+
+def split_document(document: Document) -> List[Document]:
+    """
+    Split a document into chunk documents that keep the original metadata.
+    
+    Args:
+        document (Document): The document to split.
+        
+    Returns:
+        List[Document]: The chunk documents.
+    """
+    return [
+        Document(page_content=chunk, metadata=dict(document.metadata))
+        for chunk in split_text(document.page_content)
+    ]
+
+
+def quantize_int8(vector: np.ndarray):
+    """
+    Symmetrically quantize a vector to int8 with a per-vector scale.
+    
+    Args:
+        vector (np.ndarray): The float vector to quantize.
+        
+    Returns:
+        tuple: (scale, int8 array) such that scale * int8 approximates the vector.
+    """
+    vector = np.asarray(vector, dtype=np.float32)
+    peak = float(np.abs(vector).max()) if vector.size else 0.0
+    scale = peak / 127 if peak > 0 else 1.0
+    return scale, np.round(vector / scale).astype(np.int8)
+
+
+def dequantize_int8(scale: float, quantized: np.ndarray) -> np.ndarray:
+    """
+    Reconstruct a float32 vector from its int8 quantization.
+    
+    Args:
+        scale (float): The per-vector scale returned by quantize_int8.
+        quantized (np.ndarray): The int8 values.
+        
+    Returns:
+        np.ndarray: The approximate float32 vector.
+    """
+    return quantized.astype(np.float32) * np.float32(scale)
+
+
+class EmbeddingCache:
+    """
+    Content-addressed on-disk cache of embedding vectors, backed by SQLite.
+    
+    Vectors are stored as int8 with a per-vector scale, a quarter of the float32 size.
+    """
+    def __init__(self, db_path: str, model_name: str = EMBED_MODEL_NAME):
+        """
+        Initialize the EmbeddingCache.
+        
+        Args:
+            db_path (str): Path to the SQLite database file.
+            model_name (str): Embedding model name, mixed into every key.
+        """
+        self.db_path = db_path
+        self.model_name = model_name
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with sqlite3.connect(self.db_path) as conn:
+            # Drop the float32 table written by earlier versions so it doesn't keep taking up disk
+            conn.execute("DROP TABLE IF EXISTS embeddings")
+            conn.execute("CREATE TABLE IF NOT EXISTS embeddings_int8 (hash BLOB PRIMARY KEY, scale REAL, vec BLOB)")
+
+    def key(self, text: str) -> bytes:
+        """
+        Compute the cache key for a text.
+        
+        Args:
+            text (str): The text to hash.
+            
+        Returns:
+            bytes: sha256 digest of the model name and text.
+        """
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).digest()
+
+    def get_many(self, keys: List[bytes]) -> Dict[bytes, np.ndarray]:
+        """
+        Look up cached vectors.
+        
+        Args:
+            keys (List[bytes]): Cache keys to look up.
+            
+        Returns:
+            Dict[bytes, np.ndarray]: Dequantized float32 vectors for the keys that were found.
+        """
+        found = {}
+        unique_keys = list(set(keys))
+        with sqlite3.connect(self.db_path) as conn:
+            # Stay well under SQLite's bound-parameter limit
+            for i in range(0, len(unique_keys), 500):
+                batch = unique_keys[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(f"SELECT hash, scale, vec FROM embeddings_int8 WHERE hash IN ({placeholders})", batch)
+                for h, scale, vec in rows:
+                    found[bytes(h)] = dequantize_int8(scale, np.frombuffer(vec, dtype=np.int8))
+        return found
+
+    def put_many(self, items: Dict[bytes, np.ndarray]) -> Dict[bytes, np.ndarray]:
+        """
+        Quantize and store vectors in the cache.
+        
+        Args:
+            items (Dict[bytes, np.ndarray]): Vectors keyed by cache key.
+            
+        Returns:
+            Dict[bytes, np.ndarray]: The dequantized vectors, identical to what get_many will return later.
+        """
+        rows = []
+        stored = {}
+        for h, vec in items.items():
+            scale, quantized = quantize_int8(vec)
+            rows.append((h, scale, quantized.tobytes()))
+            stored[h] = dequantize_int8(scale, quantized)
+        with sqlite3.connect(self.db_path) as conn:
+            conn.executemany("INSERT OR REPLACE INTO embeddings_int8 (hash, scale, vec) VALUES (?, ?, ?)", rows)
+        return stored
 
 
 class KnowledgeBase:
@@ -36,13 +354,68 @@ class KnowledgeBase:
         self.client = chromadb.PersistentClient(path=persist_directory)
         
         # Use local embeddings. This works without an API key.
-        self.embedding_fn = embedding_functions.SentenceTransformerEmbeddingFunction(model_name="all-MiniLM-L6-v2")
+        self.embedding_fn = LocalEmbeddingFunction(model_name=EMBED_MODEL_NAME, device=EMBED_DEVICE)
+        self.embed_cache = EmbeddingCache(os.path.join(persist_directory, "embed_cache.db"))
             
-        self.collection = self.client.get_or_create_collection(
-            name="qa_agent_kb",
+        self.collection_name = "qa_agent_kb"
+        self._ingest_count = 0
+        # Guards the collection while it is dropped and rebuilt by ingest_documents
+        self._lock = threading.RLock()
+        self.collection = self._create_collection()
+
+    def _create_collection(self):
+        """
+        Get or create the ChromaDB collection backing this knowledge base.
+        
+        Returns:
+            Collection: The ChromaDB collection.
+        """
+        return self.client.get_or_create_collection(
+            name=self.collection_name,
             embedding_function=self.embedding_fn
         )
 
+    def version(self) -> str:
+        """
+        Identify the current contents of the knowledge base, for cache invalidation.
+        
+        Changes whenever this instance ingests documents or another process rewrites the database directory.
+        
+        Returns:
+            str: An opaque version string.
+        """
+        try:
+            mtime = os.path.getmtime(self.persist_directory)
+        except OSError:
+            mtime = 0.0
+        return f"{self._ingest_count}:{mtime}"
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed texts, reusing cached vectors and only encoding the misses.
+        
+        Args:
+            texts (List[str]): Texts to embed.
+            
+        Returns:
+            List[List[float]]: One vector per text, in input order.
+        """
+        keys = [self.embed_cache.key(t) for t in texts]
+        vectors = self.embed_cache.get_many(keys)
+        
+        misses = {}
+        for k, t in zip(keys, texts):
+            if k not in vectors:
+                misses[k] = t
+        
+        if misses:
+            new_vectors = self.embedding_fn(list(misses.values()))
+            computed = {k: np.asarray(v, dtype=np.float32) for k, v in zip(misses.keys(), new_vectors)}
+            # Use the quantized values so fresh and cached ingests index identical vectors
+            vectors.update(self.embed_cache.put_many(computed))
+        
+        return [vectors[k].tolist() for k in keys]
+
     def ingest_documents(self, file_paths: List[str]):
         """
         Ingest documents from the specified file paths into the vector database.
@@ -53,88 +426,158 @@ class KnowledgeBase:
         Returns:
             int: Number of chunks ingested.
         """
-        documents = []
-        for path in file_paths:
-            try:
-                ext = os.path.splitext(path)[1].lower()
-                if ext == ".md":
-                    loader = UnstructuredMarkdownLoader(path)
-                    documents.extend(loader.load())
-                elif ext == ".txt":
-                    loader = TextLoader(path)
-                    documents.extend(loader.load())
-                elif ext == ".json":
-                    # Custom JSON loading to keep it simple and text-based
-                    with open(path, 'r', encoding='utf-8') as f:
-                        content = json.load(f)
-                    documents.append(Document(page_content=json.dumps(content, indent=2), metadata={"source": path}))
-                elif ext == ".html":
-                    # Load HTML content
-                     with open(path, 'r', encoding='utf-8') as f:
-                        soup = BeautifulSoup(f, 'html.parser')
-                        # We want the structure too, not just text, so we might keep some tags or just raw text
-                        # For RAG, raw text with some structure is usually fine.
-                        text = soup.get_text(separator='\n')
-                        documents.append(Document(page_content=text, metadata={"source": path}))
-            except Exception as e:
-                print(f"Error loading {path}: {e}")
+        # Parse files concurrently; each file is independent.
+        with ThreadPoolExecutor() as executor:
+            documents = list(itertools.chain.from_iterable(executor.map(load_document, file_paths)))
         
-        if not documents:
-            return 0
+            if not documents:
+                return 0
 
-        text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-        chunks = text_splitter.split_documents(documents)
+            chunks = list(itertools.chain.from_iterable(executor.map(split_document, documents)))
         
-        ids = [f"doc_{os.path.basename(chunk.metadata.get('source', 'unknown'))}_{i}" for i, chunk in enumerate(chunks)]
+        sources = [chunk.metadata.get('source', 'unknown') for chunk in chunks]
+        base_by_source = {source: os.path.basename(source) for source in set(sources)}
+        ids = [f"doc_{base_by_source[source]}_{i}" for i, source in enumerate(sources)]
         texts = [chunk.page_content for chunk in chunks]
         metadatas = [chunk.metadata for chunk in chunks]
         
         if texts:
-            # Clear existing to avoid duplicates in this simple implementation
-            try:
-                self.collection.delete(where={}) 
-            except:
-                pass
+            # Embed outside Chroma so unchanged chunks are served from the cache.
+            # This happens before taking the lock so queries keep hitting the old collection meanwhile.
+            embeddings = self._embed(texts)
             
-            # Add in batches with delay to avoid rate limits
-            batch_size = 5
-            for i in range(0, len(ids), batch_size):
-                end = min(i + batch_size, len(ids))
-                self.collection.add(ids=ids[i:end], documents=texts[i:end], metadatas=metadatas[i:end])
-                time.sleep(1) # Sleep 1s between batches
+            # The API shares one KnowledgeBase, so serialize rebuilds against each other and against queries.
+            with self._lock:
+                # Clear existing to avoid duplicates in this simple implementation.
+                # Dropping and recreating the collection is O(1) compared to a per-row delete.
+                self.client.delete_collection(self.collection_name)
+                self.collection = self._create_collection()
+                
+                # Embeddings are computed locally, so there is no rate limit to respect.
+                # Chroma caps the size of a single add call, so batch large ingests.
+                if len(ids) < SINGLE_ADD_LIMIT:
+                    self.collection.add(ids=ids, documents=texts, metadatas=metadatas, embeddings=embeddings)
+                else:
+                    for i in range(0, len(ids), ADD_BATCH_SIZE):
+                        end = min(i + ADD_BATCH_SIZE, len(ids))
+                        self.collection.add(
+                            ids=ids[i:end],
+                            documents=texts[i:end],
+                            metadatas=metadatas[i:end],
+                            embeddings=embeddings[i:end]
+                        )
+                self._ingest_count += 1
         
         return len(chunks)
 
-    def query(self, query_text: str, n_results: int = 5):
+    def query(self, query_text: str, n_results: int = 5, where: Dict[str, Any] = None):
         """
         Query the knowledge base for relevant documents.
         
         Args:
             query_text (str): The query string.
-            n_results (int): Number of results to return.
+            n_results (int): Number of results to return (clamped to 1..MAX_QUERY_RESULTS).
+            where (Dict[str, Any], optional): ChromaDB metadata filter applied before the vector search,
+                e.g. {"source": "temp/product_specs.md"}.
             
         Returns:
             dict: Query results from ChromaDB.
         """
-        results = self.collection.query(query_texts=[query_text], n_results=n_results)
+        # Embed the query ourselves with the same model and settings as ingestion
+        query_embedding = self.embedding_fn([query_text])[0]
+        n_results = max(1, min(n_results, MAX_QUERY_RESULTS))
+        with self._lock:
+            results = self.collection.query(query_embeddings=[query_embedding], n_results=n_results, where=where)
         return results
 
+# Shared Selenium prompt rules; the output rule differs between single and batched generation.
+SELENIUM_RULES = """Rules:
+            1. **Driver Setup**: Do NOT use 'webdriver_manager'. Use built-in Selenium Manager: `driver = webdriver.Chrome()`.
+            2. **File Loading**: Assume the target file is named 'index.html' in the same directory. Use `os.path.abspath("index.html")` combined with the `file:///` prefix to load it. Example: `driver.get("file:///" + os.path.abspath("index.html"))`.
+            3. **Color Assertions**: Import `from selenium.webdriver.support.color import Color`. Convert CSS colors to Hex for comparison (e.g., `assert Color.from_string(elem.value_of_css_property('color')).hex == '#ff0000'`).
+            4. **Clean Code**: Do NOT import unused libraries like `math` or `webdriver_manager`. Keep imports minimal.
+            5. **Visual Feedback**: Add `print("SUCCESS: Test Case [Name] Passed")` at the very end of the script.
+            6. **Waits & Selectors**: Use `WebDriverWait` and robust selectors (ID, CSS) that exist in the HTML."""
+
+SELENIUM_GUIDELINES = """Robustness Guidelines:
+            - Data Parsing: When parsing currency (e.g., "$100.00"), remove non-numeric characters before converting to float. Handle empty strings gracefully.
+            - Assertions: Use 'in' for text checks instead of '==' (e.g., "Discount Applied" in message). Use round() for float comparisons if needed.
+            - Selectors: Prefer IDs or data attributes over text content."""
+
+# Markdown code fences the LLM sometimes wraps scripts in
+MARKDOWN_FENCE_RE = re.compile(r"```(?:python)?")
+
+# Distinct requirements whose generated test cases are memoized per agent
+TEST_CASE_CACHE_SIZE = 64
+
+# Test cases per batched script-generation prompt
+SCRIPT_BATCH_SIZE = 8
+
+# Markup that carries no selectors, messages or styling the generated scripts assert on.
+# Inline <script> and <style> are kept: message texts, colours and visibility often live only there.
+HTML_NOISE_XPATH = "//svg|//noscript|//meta|//link|//comment()"
+HTML_DOCUMENT_RE = re.compile(r"<html[\s>]", re.IGNORECASE)
+BLANK_LINES_RE = re.compile(r"\n\s*\n+")
+
+
+def reduce_html(html_content: str) -> str:
+    """
+    Strip markup that is irrelevant for writing selectors before sending HTML to the LLM.
+    
+    Removes inline SVG, comments, noscript blocks and head metadata, and collapses blank lines.
+    Scripts and styles are kept. Fragments and plain text are returned without a wrapper element.
+    Falls back to the original content if it cannot be parsed.
+    
+    Args:
+        html_content (str): The HTML content of the target page.
+        
+    Returns:
+        str: The reduced HTML.
+    """
+    if not html_content or not html_content.strip():
+        return html_content
+    is_document = bool(HTML_DOCUMENT_RE.search(html_content))
+    try:
+        if is_document:
+            tree = lxml_html.document_fromstring(html_content)
+        else:
+            # Parse into a temporary wrapper so only the original content is serialized
+            tree = lxml_html.fragment_fromstring(html_content, create_parent="div")
+    except (etree.ParserError, ValueError):
+        return html_content
+    
+    for element in tree.xpath(HTML_NOISE_XPATH):
+        if element.getparent() is not None:
+            element.drop_tree()
+    
+    if is_document:
+        reduced = lxml_html.tostring(tree, encoding="unicode")
+    else:
+        reduced = html.escape(tree.text or "", quote=False) + "".join(
+            lxml_html.tostring(child, encoding="unicode") for child in tree
+        )
+    return BLANK_LINES_RE.sub("\n", reduced).strip()
+
+
 class QAAgent:
     """
     Agent responsible for generating test cases and Selenium scripts using LLMs.
     """
-    def __init__(self, api_key: str = None, model: str = "llama-3.3-70b-versatile"):
+    def __init__(self, api_key: str = None, model: str = "llama-3.3-70b-versatile", kb: KnowledgeBase = None):
         """
         Initialize the QAAgent.
         
         Args:
             api_key (str, optional): API Key for the LLM.
             model (str): Model name to use.
+            kb (KnowledgeBase, optional): Shared knowledge base. A new one is created if omitted.
         """
         if not api_key:
             api_key = os.getenv("GROQ_API_KEY") or os.getenv("API_KEY")
             
-        self.kb = KnowledgeBase()
+        self.kb = kb or KnowledgeBase()
+        # Memoize test case generation per (requirement, knowledge base version), least recently used first
+        self._test_case_cache = OrderedDict()
         
         # Configure LLM (Groq only)
         self.llm = ChatGroq(
@@ -143,18 +586,43 @@ class QAAgent:
             temperature=0.2
         )
 
-    def generate_test_cases(self, requirement: str) -> List[Dict]:
+    async def generate_test_cases(self, requirement: str) -> List[Dict]:
         """
         Generate test cases based on the provided requirement and knowledge base context.
         
+        Identical requirements are served from an in-memory cache until the knowledge base changes.
+        
         Args:
             requirement (str): The test requirement description.
             
         Returns:
             List[Dict]: A list of generated test cases.
         """
-        # 1. Retrieve context
-        context_results = self.kb.query(requirement)
+        key = (requirement, self.kb.version())
+        if key in self._test_case_cache:
+            self._test_case_cache.move_to_end(key)
+        else:
+            try:
+                self._test_case_cache[key] = await self._generate_test_cases(requirement)
+            except Exception as e:
+                return [{"error": str(e)}]
+            if len(self._test_case_cache) > TEST_CASE_CACHE_SIZE:
+                self._test_case_cache.popitem(last=False)
+        # Hand out a copy so callers can't mutate the cached result
+        return copy.deepcopy(self._test_case_cache[key])
+
+    async def _generate_test_cases(self, requirement: str) -> List[Dict]:
+        """
+        Generate test cases without caching. Errors are raised rather than returned.
+        
+        Args:
+            requirement (str): The test requirement description.
+            
+        Returns:
+            List[Dict]: A list of generated test cases.
+        """
+        # 1. Retrieve context (embedding the query is CPU-bound, so keep it off the event loop)
+        context_results = await asyncio.to_thread(self.kb.query, requirement)
         context_docs = context_results['documents'][0]
         context_sources = [m['source'] for m in context_results['metadatas'][0]]
         
@@ -185,24 +653,15 @@ class QAAgent:
         # 3. Chain
         chain = prompt | self.llm | JsonOutputParser()
         
-        try:
-            result = chain.invoke({"context": context_str, "requirement": requirement})
-            return result
-        except Exception as e:
-            return [{"error": str(e)}]
+        return await chain.ainvoke({"context": context_str, "requirement": requirement})
 
-    def generate_selenium_script(self, test_case: Dict, html_content: str) -> str:
+    def _selenium_script_chain(self):
         """
-        Generate a Selenium Python script for a specific test case.
+        Build the prompt chain used to generate a single Selenium script.
         
-        Args:
-            test_case (Dict): The test case details.
-            html_content (str): The HTML content of the target page.
-            
         Returns:
-            str: The generated Python script.
+            Runnable: The prompt | LLM | string parser chain.
         """
-        # 1. Construct Prompt
         prompt = ChatPromptTemplate.from_messages([
             ("system", """You are an expert Selenium Python Automation Engineer.
             Your task is to write a robust, runnable Python Selenium script for a specific test case.
@@ -210,19 +669,10 @@ class QAAgent:
             Target HTML Content:
             {html_content}
             
-            Rules:
-            1. **Driver Setup**: Do NOT use 'webdriver_manager'. Use built-in Selenium Manager: `driver = webdriver.Chrome()`.
-            2. **File Loading**: Assume the target file is named 'index.html' in the same directory. Use `os.path.abspath("index.html")` combined with the `file:///` prefix to load it. Example: `driver.get("file:///" + os.path.abspath("index.html"))`.
-            3. **Color Assertions**: Import `from selenium.webdriver.support.color import Color`. Convert CSS colors to Hex for comparison (e.g., `assert Color.from_string(elem.value_of_css_property('color')).hex == '#ff0000'`).
-            4. **Clean Code**: Do NOT import unused libraries like `math` or `webdriver_manager`. Keep imports minimal.
-            5. **Visual Feedback**: Add `print("SUCCESS: Test Case [Name] Passed")` at the very end of the script.
-            6. **Waits & Selectors**: Use `WebDriverWait` and robust selectors (ID, CSS) that exist in the HTML.
+            {rules}
             7. **Output**: Return ONLY the Python code, no markdown formatting like ```python.
             
-            Robustness Guidelines:
-            - Data Parsing: When parsing currency (e.g., "$100.00"), remove non-numeric characters before converting to float. Handle empty strings gracefully.
-            - Assertions: Use 'in' for text checks instead of '==' (e.g., "Discount Applied" in message). Use round() for float comparisons if needed.
-            - Selectors: Prefer IDs or data attributes over text content.
+            {guidelines}
             """),
             ("user", """Test Case:
             {test_case}
@@ -230,14 +680,129 @@ class QAAgent:
             Generate the Python Selenium script:
             """)
         ])
+        return prompt | self.llm | StrOutputParser()
+
+    def _selenium_script_inputs(self, test_case: Dict, html_content: str) -> Dict[str, str]:
+        """
+        Build the prompt variables for a single Selenium script.
         
-        # 2. Chain
-        chain = prompt | self.llm | StrOutputParser()
+        Args:
+            test_case (Dict): The test case details.
+            html_content (str): The HTML content of the target page.
+            
+        Returns:
+            Dict[str, str]: Variables for the script generation prompt.
+        """
+        return {
+            "html_content": reduce_html(html_content),
+            "rules": SELENIUM_RULES,
+            "guidelines": SELENIUM_GUIDELINES,
+            "test_case": json.dumps(test_case, indent=2)
+        }
+
+    async def generate_selenium_script(self, test_case: Dict, html_content: str) -> str:
+        """
+        Generate a Selenium Python script for a specific test case.
+        
+        Args:
+            test_case (Dict): The test case details.
+            html_content (str): The HTML content of the target page.
+            
+        Returns:
+            str: The generated Python script.
+        """
+        chain = self._selenium_script_chain()
         
         try:
-            result = chain.invoke({"html_content": html_content, "test_case": json.dumps(test_case, indent=2)})
+            result = await chain.ainvoke(self._selenium_script_inputs(test_case, html_content))
             # Clean up markdown if present
-            result = result.replace("```python", "").replace("```", "").strip()
+            result = MARKDOWN_FENCE_RE.sub("", result).strip()
             return result
         except Exception as e:
             return f"# Error generating script: {str(e)}"
+
+    async def astream_selenium_script(self, test_case: Dict, html_content: str) -> AsyncIterator[str]:
+        """
+        Asynchronously stream a Selenium Python script for a specific test case.
+        
+        Chunks are yielded raw; callers should strip any markdown fences from the joined result.
+        LLM errors are raised so callers can tell a failure apart from script text.
+        
+        Args:
+            test_case (Dict): The test case details.
+            html_content (str): The HTML content of the target page.
+            
+        Yields:
+            str: Successive chunks of the generated script.
+        """
+        chain = self._selenium_script_chain()
+        
+        async for chunk in chain.astream(self._selenium_script_inputs(test_case, html_content)):
+            yield chunk
+
+    async def generate_selenium_scripts(self, test_cases: List[Dict], html_content: str) -> List[str]:
+        """
+        Generate Selenium Python scripts for several test cases, batching them into shared prompts.
+        
+        The HTML context is sent once per batch rather than once per test case.
+        
+        Args:
+            test_cases (List[Dict]): The test cases to automate.
+            html_content (str): The HTML content of the target page.
+            
+        Returns:
+            List[str]: One generated Python script per test case, in input order.
+        """
+        # 1. Construct Prompt
+        prompt = ChatPromptTemplate.from_messages([
+            ("system", """You are an expert Selenium Python Automation Engineer.
+            Your task is to write a robust, runnable Python Selenium script for each of several test cases.
+            
+            Target HTML Content:
+            {html_content}
+            
+            {rules}
+            7. **Output**: Return ONLY a valid JSON object mapping each test case number (as a string) to its complete Python script, e.g. {{"1": "<script>", "2": "<script>"}}. Do not use markdown formatting inside the scripts.
+            
+            {guidelines}
+            """),
+            ("user", """Test Cases:
+            {test_cases}
+            
+            Generate one Python Selenium script per test case in JSON format:
+            """)
+        ])
+        
+        # 2. Chain
+        chain = prompt | self.llm | JsonOutputParser()
+        
+        html_content = reduce_html(html_content)
+
+        async def generate_batch(batch: List[Dict]) -> List[str]:
+            numbered = "\n\n".join(f"{n}. {json.dumps(tc, indent=2)}" for n, tc in enumerate(batch, start=1))
+            try:
+                result = await chain.ainvoke({
+                    "html_content": html_content,
+                    "rules": SELENIUM_RULES,
+                    "guidelines": SELENIUM_GUIDELINES,
+                    "test_cases": numbered
+                })
+                # Accept either the requested {"1": ...} object or a JSON array in test case order
+                if isinstance(result, list):
+                    found = result
+                else:
+                    found = [result.get(str(n)) for n in range(1, len(batch) + 1)]
+                scripts = []
+                for n in range(len(batch)):
+                    script = found[n] if n < len(found) else None
+                    if not isinstance(script, str):
+                        script = "# Error generating script: missing from model response"
+                    scripts.append(MARKDOWN_FENCE_RE.sub("", script).strip())
+                return scripts
+            except Exception as e:
+                return [f"# Error generating script: {str(e)}" for _ in batch]
+
+        # Batches are independent, so request them concurrently
+        batches = [test_cases[i:i + SCRIPT_BATCH_SIZE] for i in range(0, len(test_cases), SCRIPT_BATCH_SIZE)]
+        results = await asyncio.gather(*[generate_batch(batch) for batch in batches])
+        return list(itertools.chain.from_iterable(results))
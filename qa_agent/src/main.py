@@ -4,14 +4,36 @@ This script initializes the Streamlit UI and communicates with the FastAPI backe
 to handle knowledge base building, test case generation, and script creation.
 """
 
+import asyncio
+import re
 import streamlit as st
 import requests
+import httpx
 import json
 import pandas as pd
 
 # API Base URL
 API_URL = "http://localhost:8000"
 
+# Markdown code fences the LLM sometimes wraps scripts in
+MARKDOWN_FENCE_RE = re.compile(r"```(?:python)?")
+
+@st.cache_resource
+def get_session() -> requests.Session:
+    """
+    Shared HTTP session so connections to the backend are pooled across reruns.
+    """
+    return requests.Session()
+
+session = get_session()
+
+async def post_all(path: str, payloads: list) -> list:
+    """
+    POST several payloads to the backend concurrently and return the responses in order.
+    """
+    async with httpx.AsyncClient(base_url=API_URL, timeout=120) as client:
+        return await asyncio.gather(*[client.post(path, json=payload) for payload in payloads])
+
 # Configure the Streamlit page with title and layout
 st.set_page_config(page_title="Autonomous QA Agent", layout="wide")
 
@@ -61,26 +83,18 @@ with tab1:
         if uploaded_files and uploaded_html:
             with st.spinner("Ingesting documents and building vector database..."):
                 try:
-                    # Prepare files for upload
-                    files_to_upload = []
-                    for f in uploaded_files:
-                        files_to_upload.append(('files', (f.name, f.getvalue(), f.type)))
-                    
-                    # Prepare HTML file
-                    html_file = ('html_file', (uploaded_html.name, uploaded_html.getvalue(), uploaded_html.type))
-                    
                     # Store HTML content in session state
-                    uploaded_html.seek(0)
-                    st.session_state.html_content = uploaded_html.read().decode('utf-8')
+                    st.session_state.html_content = uploaded_html.getvalue().decode('utf-8')
 
-                    # Correct way to send multiple files and a specific file in requests
-                    # We need to reconstruct the files dictionary
-                    multipart_files = []
+                    # Pass the uploaded file objects directly so requests reads them
+                    # instead of copying every file's bytes with getvalue() first
                     for f in uploaded_files:
-                        multipart_files.append(('files', (f.name, f.getvalue(), f.type)))
-                    multipart_files.append(('html_file', (uploaded_html.name, uploaded_html.getvalue(), uploaded_html.type)))
+                        f.seek(0)
+                    uploaded_html.seek(0)
+                    multipart_files = [('files', (f.name, f, f.type)) for f in uploaded_files]
+                    multipart_files.append(('html_file', (uploaded_html.name, uploaded_html, uploaded_html.type)))
 
-                    response = requests.post(f"{API_URL}/ingest", files=multipart_files)
+                    response = session.post(f"{API_URL}/ingest", files=multipart_files)
                     
                     if response.status_code == 200:
                         data = response.json()
@@ -113,7 +127,7 @@ with tab2:
                             "api_key": api_key,
                             "model": model_name
                         }
-                        response = requests.post(f"{API_URL}/generate-test-cases", json=payload)
+                        response = session.post(f"{API_URL}/generate-test-cases", json=payload)
                         
                         if response.status_code == 200:
                             result = response.json()
@@ -146,36 +160,102 @@ with tab3:
     elif not st.session_state.test_cases:
         st.warning("Please generate test cases in Tab 2 first.")
     else:
-        st.markdown("Select a test case to generate the automation script.")
+        st.markdown("Select one or more test cases to generate automation scripts.")
         
         # Create a selection list
         test_case_options = [f"{tc.get('Test_ID', 'N/A')}: {tc.get('Test_Scenario', 'N/A')}" for tc in st.session_state.test_cases]
-        selected_option = st.selectbox("Select Test Case", test_case_options)
+        selected_options = st.multiselect("Select Test Cases", test_case_options, default=test_case_options[:1])
         
         if st.button("Generate Selenium Script", type="primary"):
             if not api_key:
                 st.error("Please enter an API Key in the sidebar.")
+            elif not selected_options:
+                st.error("Please select at least one test case.")
             else:
-                # Find the selected test case object
-                index = test_case_options.index(selected_option)
-                selected_test_case = st.session_state.test_cases[index]
+                # Find the selected test case objects
+                selected_test_cases = [st.session_state.test_cases[test_case_options.index(o)] for o in selected_options]
                 
-                with st.spinner("Generating Selenium Script..."):
+                if len(selected_test_cases) == 1:
+                    # Stream a single script so output appears as it is generated
+                    try:
+                        payload = {
+                            "test_case": selected_test_cases[0],
+                            "html_content": st.session_state.html_content,
+                            "api_key": api_key,
+                            "model": model_name
+                        }
+                        with session.post(f"{API_URL}/generate-script/stream", json=payload, stream=True) as response:
+                            if response.status_code == 200:
+                                st.subheader("Generated Python Script")
+                                placeholder = st.empty()
+                                script = ""
+                                for chunk in response.iter_content(chunk_size=None, decode_unicode=True):
+                                    script += chunk
+                                    placeholder.code(script, language="python")
+                                # Clean up markdown if present
+                                script = MARKDOWN_FENCE_RE.sub("", script).strip()
+                                placeholder.code(script, language="python")
+                                if "# Error generating script:" in script:
+                                    st.error("Script generation failed part-way through; the output above is incomplete.")
+                                else:
+                                    st.success("Script Generated! Copy the code above.")
+                            else:
+                                st.error(f"Error generating script: {response.text}")
+                    except Exception as e:
+                        st.error(f"Connection Error: {e}")
+                else:
+                    with st.spinner("Generating Selenium Scripts..."):
+                        try:
+                            payloads = [{
+                                "test_case": test_case,
+                                "html_content": st.session_state.html_content,
+                                "api_key": api_key,
+                                "model": model_name
+                            } for test_case in selected_test_cases]
+                            # Generate the selected scripts concurrently
+                            responses = asyncio.run(post_all("/generate-script", payloads))
+                            
+                            for option, response in zip(selected_options, responses):
+                                if response.status_code == 200:
+                                    script = response.json().get("script", "")
+                                    st.subheader(f"Generated Python Script - {option}")
+                                    st.code(script, language="python")
+                                else:
+                                    st.error(f"Error generating script for {option}: {response.text}")
+                            if all(r.status_code == 200 for r in responses):
+                                st.success("Script Generated! Copy the code above.")
+                        except Exception as e:
+                            st.error(f"Connection Error: {e}")
+
+        st.divider()
+        st.markdown("Or generate scripts for every test case at once.")
+        
+        if st.button("Generate All Selenium Scripts"):
+            if not api_key:
+                st.error("Please enter an API Key in the sidebar.")
+            else:
+                with st.spinner(f"Generating {len(st.session_state.test_cases)} Selenium Scripts..."):
                     try:
                         payload = {
-                            "test_case": selected_test_case,
+                            "test_cases": st.session_state.test_cases,
                             "html_content": st.session_state.html_content,
                             "api_key": api_key,
                             "model": model_name
                         }
-                        response = requests.post(f"{API_URL}/generate-script", json=payload)
+                        response = session.post(f"{API_URL}/generate-scripts", json=payload)
                         
                         if response.status_code == 200:
-                            script = response.json().get("script", "")
-                            st.subheader("Generated Python Script")
-                            st.code(script, language="python")
-                            st.success("Script Generated! Copy the code above.")
+                            scripts = response.json().get("scripts", [])
+                            st.subheader("Generated Python Scripts")
+                            for option, script in zip(test_case_options, scripts):
+                                with st.expander(option):
+                                    st.code(script, language="python")
+                            failed = [o for o, script in zip(test_case_options, scripts) if script.startswith("# Error generating script:")]
+                            if failed:
+                                st.error(f"Failed to generate {len(failed)} of {len(scripts)} scripts: {', '.join(failed)}")
+                            else:
+                                st.success(f"Generated {len(scripts)} scripts!")
                         else:
-                            st.error(f"Error generating script: {response.text}")
+                            st.error(f"Error generating scripts: {response.text}")
                     except Exception as e:
                         st.error(f"Connection Error: {e}")